@@ -1,13 +1,13 @@
 import asyncio
 import logging
-from collections import deque
+import math
+from collections import OrderedDict, deque
 from datetime import datetime, timezone
-import aiohttp
 
 from src.infrastructure.github_client import GitHubGraphQLClient
 from src.infrastructure.acl import GitHubTranslator
 from src.infrastructure.database import PostgresRepository
-from src.domain.exceptions import RateLimitExceededException
+from src.domain.exceptions import CircuitOpenException, RateLimitExceededException
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +15,50 @@ logger = logging.getLogger(__name__)
 MAX_SEARCH_RESULTS = 1_000
 INITIAL_MIN_STARS = 1
 INITIAL_MAX_STARS = 1_000_000
-INTER_REQUEST_DELAY = 1.0  # Seconds between requests to avoid secondary rate limits
 MAX_CONSECUTIVE_ERRORS = 5
-# Limit concurrent connections to avoid overwhelming GitHub's servers
-CONNECTOR_LIMIT = 10
-# Number of star-ranges crawled concurrently
-MAX_CONCURRENT_RANGES = 3
+# Below this many remaining points a worker waits for the rate-limit window to reset
+RATE_LIMIT_FLOOR = 10
+# Default number of star-ranges crawled concurrently; kept within the client's
+# in-flight request bound and per-host connection limit
+MAX_CONCURRENT_RANGES = 8
+# Batches queued for the single writer; a full queue makes workers wait, bounding buffered rows
+WRITE_QUEUE_SIZE = 4
+# Pages buffered per range before they are written in one transaction
+PAGES_PER_COMMIT = 10
+# Recently written repo ids remembered to skip duplicate upserts (LRU)
+SEEN_IDS_CAPACITY = 200_000
+
+
+class RateBudget:
+    """
+    Tracks the GraphQL point budget reported by the latest response and paces
+    requests so concurrent range workers spread it evenly until the reset.
+    """
+
+    def __init__(self) -> None:
+        self.remaining: int | None = None
+        self.reset_at: datetime | None = None
+
+    def update(self, remaining: int | None, reset_at: str | None) -> None:
+        # Cached pages carry no rate information; keep the last known budget
+        if remaining is None:
+            return
+        self.remaining = remaining
+        if reset_at:
+            self.reset_at = datetime.fromisoformat(reset_at)
+
+    def delay(self, concurrency: int) -> float:
+        """Seconds a worker should wait before its next request."""
+        if self.remaining is None or self.reset_at is None:
+            return 0.0
+        seconds_to_reset = (self.reset_at - datetime.now(timezone.utc)).total_seconds()
+        if seconds_to_reset <= 0:
+            return 0.0
+        # Only throttle once the budget can't sustain one request per second per worker
+        if self.remaining / seconds_to_reset >= concurrency:
+            return 0.0
+        # With fewer points than workers the even share overshoots; never wait past the reset
+        return min(seconds_to_reset / max(self.remaining, 1) * concurrency, seconds_to_reset)
 
 
 class CrawlerService:
@@ -36,16 +74,37 @@ class CrawlerService:
             self, 
             github_client: GitHubGraphQLClient,
             db_repository: PostgresRepository,
-            target_count: int = 100_000
+            target_count: int = 100_000,
+            max_concurrent_ranges: int = MAX_CONCURRENT_RANGES,
     ):
         self.github_client = github_client
         self.db_repository = db_repository
         self.target_count = target_count
+        self.max_concurrent_ranges = max_concurrent_ranges
+
+    @property
+    def _total_fetched(self) -> int:
+        return sum(self._per_worker_fetched)
 
     @staticmethod
     def _build_search_query(min_stars: int, max_stars: int) -> str:
         return f"stars:{min_stars}..{max_stars}"
 
+    @staticmethod
+    def _split_point(min_stars: int, max_stars: int, repo_count: int) -> int:
+        """
+        Pick a split so the lower half holds roughly MAX_SEARCH_RESULTS repos.
+
+        Star counts follow a power law (millions of 1-star repos, a handful with
+        100k+), so the split is placed in log space, scaled by how far over the
+        cap the range is, rather than at the arithmetic midpoint.
+        """
+        ratio = MAX_SEARCH_RESULTS / repo_count
+        log_lo = math.log(min_stars + 1)
+        log_hi = math.log(max_stars + 1)
+        mid = int(math.exp(log_lo + (log_hi - log_lo) * ratio))
+        return min(max(mid, min_stars), max_stars - 1)
+
     async def crawl(self) -> None:
         """
         Crawls GitHub repositories by partitioning the star-count space into
@@ -53,108 +112,314 @@ class CrawlerService:
 
         Multiple ranges are crawled concurrently for maximum throughput.
         """
-        self._total_fetched = 0
-        self._lock = asyncio.Lock()
-        ranges: deque[tuple[int, int]] = deque([(INITIAL_MIN_STARS, INITIAL_MAX_STARS)])
-
-        logger.info(f"Starting crawl to fetch up to {self.target_count} repositories.")
-
-        async with aiohttp.ClientSession(
-            connector=aiohttp.TCPConnector(limit=CONNECTOR_LIMIT),
-        ) as session:
-            await self.github_client.validate_token(session)
-
-            while ranges and self._total_fetched < self.target_count:
-                # Launch up to MAX_CONCURRENT_RANGES workers at once
-                batch: list[tuple[int, int]] = []
-                while ranges and len(batch) < MAX_CONCURRENT_RANGES:
-                    batch.append(ranges.popleft())
-
-                tasks = [
-                    self._crawl_range(session, self._build_search_query(lo, hi), lo, hi, ranges)
-                    for lo, hi in batch
+        # One slot per worker, added to by its owner and reduced by the writer when a
+        # batch fails; both run on the event loop without awaiting mid-update, so no lock
+        self._per_worker_fetched = [0] * self.max_concurrent_ranges
+        self._target_reached = asyncio.Event()
+        self._work_available = asyncio.Event()
+        self._busy_workers = 0
+        self._rate_budget = RateBudget()
+        self._write_queue: asyncio.Queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+        # Lower half of a split -> (upper half, parent count), used to estimate the upper half
+        self._pending_siblings: dict[tuple[int, int], tuple[tuple[int, int], int]] = {}
+        self._range_estimates: dict[tuple[int, int], int] = {}
+        self._seen_ids: OrderedDict[str, None] = OrderedDict()
+        # Consecutive failed writes per range, so a write that always fails can't re-queue it forever
+        self._write_failures: dict[tuple[int, int], int] = {}
+
+        # Each worker owns a private deque; the initial range is seeded round-robin
+        queues: list[deque[tuple[int, int]]] = [deque() for _ in range(self.max_concurrent_ranges)]
+        initial_ranges = [(INITIAL_MIN_STARS, INITIAL_MAX_STARS)]
+        for i, star_range in enumerate(initial_ranges):
+            queues[i % len(queues)].append(star_range)
+
+        logger.info("Starting crawl to fetch up to %d repositories.", self.target_count)
+
+        await self.github_client.validate_token()
+
+        # Fetching and writing overlap: workers produce batches, one writer consumes them.
+        # If the writer fails, the group cancels the workers instead of leaving them
+        # blocked on the full write queue
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(self._writer())
+                workers = [
+                    tasks.create_task(self._worker(worker_id, queues))
+                    for worker_id in range(len(queues))
                 ]
+                await asyncio.gather(*workers)
+                # Tell the writer no more batches are coming
+                await self._write_queue.put(None)
+        except ExceptionGroup as group:
+            # Surface the failure itself (e.g. the DB being unreachable), not the group
+            raise group.exceptions[0]
 
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info("Crawling completed. Total repositories fetched: %d.", self._total_fetched)
 
-                for result in results:
-                    if isinstance(result, RateLimitExceededException):
-                        reset_time = datetime.fromisoformat(result.reset_at.replace("Z", "+00:00"))
-                        now = datetime.now(timezone.utc)
-                        wait_seconds = max((reset_time - now).total_seconds() + 5, 1)
-                        logger.warning(f"Rate limit exceeded. Waiting {wait_seconds:.0f}s until {result.reset_at}.")
-                        await asyncio.sleep(wait_seconds)
-                    elif isinstance(result, Exception):
-                        logger.error(f"Unexpected error in range worker: {result}")
+    @staticmethod
+    def _next_range(
+        worker_id: int, queues: list[deque[tuple[int, int]]],
+    ) -> tuple[int, int] | None:
+        """Pop from the worker's own front, otherwise steal from the back of a peer."""
+        local = queues[worker_id]
+        if local:
+            return local.popleft()
+        for offset in range(1, len(queues)):
+            peer = queues[(worker_id + offset) % len(queues)]
+            if peer:
+                return peer.pop()
+        return None
 
-        logger.info(f"Crawling completed. Total repositories fetched: {self._total_fetched}.")
+    async def _worker(self, worker_id, queues) -> None:
+        """Crawl star-ranges until the target is reached or every queue has drained."""
+        local = queues[worker_id]
+
+        while not self._target_reached.is_set():
+            star_range = self._next_range(worker_id, queues)
+
+            if star_range is None:
+                if self._busy_workers == 0:
+                    # Nobody is left to produce new ranges: wake the others so they exit
+                    self._work_available.set()
+                    return
+                self._work_available.clear()
+                await self._work_available.wait()
+                continue
+
+            lo, hi = star_range
+            self._busy_workers += 1
+            try:
+                await self._crawl_range(
+                    worker_id, self._build_search_query(lo, hi), lo, hi, local,
+                )
+            except RateLimitExceededException as e:
+                await self._wait_for_reset(e.reset_at)
+            except CircuitOpenException as e:
+                logger.warning("GitHub circuit open. Pausing worker for %.0fs.", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                logger.error("Unexpected error in range worker: %s", e)
+            finally:
+                self._busy_workers -= 1
+                # Let idle peers re-check for stealable work or termination
+                self._work_available.set()
+
+        # Release idle peers once the target has been reached
+        self._work_available.set()
+
+    @staticmethod
+    async def _wait_for_reset(reset_at: str | None) -> None:
+        try:
+            reset_time = datetime.fromisoformat(reset_at)
+            wait_seconds = max((reset_time - datetime.now(timezone.utc)).total_seconds() + 5, 1)
+        except (TypeError, ValueError):
+            # The reset time can be unknown (None) or unparseable
+            wait_seconds = 60
+        logger.warning("Rate limit exceeded. Waiting %.0fs until %s.", wait_seconds, reset_at)
+        await asyncio.sleep(wait_seconds)
+
+    def _split_range(self, min_stars, max_stars, repo_count, ranges) -> None:
+        mid = self._split_point(min_stars, max_stars, repo_count)
+        logger.info(
+            "Range 'stars:%d..%d' has %d repos (>%d). Splitting at %d.",
+            min_stars, max_stars, repo_count, MAX_SEARCH_RESULTS, mid,
+        )
+        self._pending_siblings[(min_stars, mid)] = ((mid + 1, max_stars), repo_count)
+        # Keep both halves on this worker's own deque; idle peers steal from the back
+        ranges.appendleft((mid + 1, max_stars))
+        ranges.appendleft((min_stars, mid))
+        self._work_available.set()
+
+    def _record_sibling_estimate(self, min_stars, max_stars, repo_count) -> None:
+        """Once a lower half's count is known, the upper half's is the parent's remainder."""
+        sibling = self._pending_siblings.pop((min_stars, max_stars), None)
+        if sibling is not None:
+            upper, parent_count = sibling
+            self._range_estimates[upper] = max(parent_count - repo_count, 0)
 
     async def _crawl_range(
-        self, session, search_query, min_stars, max_stars, ranges,
+        self, worker_id, search_query, min_stars, max_stars, ranges,
     ) -> None:
         """Paginate through a single star-count range, splitting if it exceeds the API cap."""
         cursor = None
         consecutive_errors = 0
+        last_write: asyncio.Future | None = None
+        buffered: list[dict] = []
+        buffered_pages = 0
 
-        while self._total_fetched < self.target_count:
+        # A sibling's count may already tell us this range is over the cap
+        estimate = self._range_estimates.pop((min_stars, max_stars), None)
+        if estimate is not None and estimate > MAX_SEARCH_RESULTS and max_stars > min_stars:
+            self._split_range(min_stars, max_stars, estimate, ranges)
+            return
+
+        while not self._target_reached.is_set():
             try:
-                raw_nodes, next_cursor, has_next_page, repo_count = \
-                    await self.github_client.fetch_page(session, cursor, search_query)
+                page = await self.github_client.fetch_page(cursor, search_query)
+                self._rate_budget.update(page.rate_remaining, page.rate_reset_at)
 
                 # On the first page, check if this range needs splitting
-                if cursor is None and repo_count > MAX_SEARCH_RESULTS and max_stars - min_stars > 0:
-                    mid = (min_stars + max_stars) // 2
-                    if mid > min_stars:
-                        logger.info(
-                            f"Range '{search_query}' has {repo_count} repos "
-                            f"(>{MAX_SEARCH_RESULTS}). Splitting at {mid}."
-                        )
-                        async with self._lock:
-                            ranges.appendleft((mid + 1, max_stars))
-                            ranges.appendleft((min_stars, mid))
+                if cursor is None:
+                    self._record_sibling_estimate(min_stars, max_stars, page.repo_count)
+                    if page.repo_count > MAX_SEARCH_RESULTS and max_stars > min_stars:
+                        self._split_range(min_stars, max_stars, page.repo_count, ranges)
                         return
 
                 consecutive_errors = 0
 
-                if not raw_nodes:
+                if not page.nodes:
                     break
 
-                async with self._lock:
-                    remaining = self.target_count - self._total_fetched
-                    if remaining <= 0:
-                        break
-                    nodes_to_process = raw_nodes[:remaining]
+                # No await between reading the counter and taking rows, so this is atomic
+                remaining = self.target_count - self._total_fetched
+                if remaining <= 0:
+                    break
+                # Translate lazily so nodes past the target are never converted or copied;
+                # empty (non-Repository) and malformed nodes are dropped without raising
+                rows = self._take_unseen(GitHubTranslator.to_rows(page.nodes), remaining)
 
-                entities = [GitHubTranslator.to_domain(node) for node in nodes_to_process if node]
-                await self.db_repository.bulk_upsert(entities)
+                batch_size = len(rows)
+                self._per_worker_fetched[worker_id] += batch_size
+                total_fetched = self._total_fetched
+                if total_fetched >= self.target_count:
+                    self._target_reached.set()
 
-                batch_size = len(entities)
-                async with self._lock:
-                    self._total_fetched += batch_size
+                # Hand every PAGES_PER_COMMIT pages to the writer as one transaction
+                buffered.extend(rows)
+                buffered_pages += 1
+                if buffered_pages >= PAGES_PER_COMMIT:
+                    last_write = await self._flush(
+                        worker_id, buffered, min_stars, max_stars, ranges,
+                    ) or last_write
+                    buffered, buffered_pages = [], 0
 
-                cursor = next_cursor
+                cursor = page.end_cursor
 
                 logger.info(
-                    f"[{search_query}] Fetched {batch_size}. "
-                    f"Total: {self._total_fetched}/{self.target_count}."
+                    "[%s] Fetched %d. Total: %d/%d.",
+                    search_query, batch_size, total_fetched, self.target_count,
                 )
 
-                if self._total_fetched >= self.target_count or not has_next_page:
+                if self._target_reached.is_set() or not page.has_next:
                     break
 
-                await asyncio.sleep(INTER_REQUEST_DELAY)
+                if page.rate_remaining is not None and page.rate_remaining < RATE_LIMIT_FLOOR:
+                    # Persist what we have before the long wait, then resume from the cursor
+                    last_write = await self._flush(
+                        worker_id, buffered, min_stars, max_stars, ranges,
+                    ) or last_write
+                    buffered, buffered_pages = [], 0
+                    if last_write:
+                        await last_write
+                    await self._wait_for_reset(page.rate_reset_at)
+                    continue
+
+                needed_delay = self._rate_budget.delay(self.max_concurrent_ranges)
+                if needed_delay > 0:
+                    await asyncio.sleep(needed_delay)
 
-            except RateLimitExceededException:
+            except (RateLimitExceededException, CircuitOpenException):
+                # Persist what we have before the long wait
+                last_write = await self._flush(
+                    worker_id, buffered, min_stars, max_stars, ranges,
+                ) or last_write
+                if last_write:
+                    await last_write
                 # Re-queue this range so it gets retried after the wait
-                async with self._lock:
-                    ranges.appendleft((min_stars, max_stars))
+                ranges.appendleft((min_stars, max_stars))
+                self._work_available.set()
                 raise
 
             except Exception as e:
                 consecutive_errors += 1
                 if consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
-                    logger.error(f"Too many consecutive errors for '{search_query}'. Skipping range.")
+                    logger.error("Too many consecutive errors for '%s'. Skipping range.", search_query)
                     break
                 wait = 10 * consecutive_errors
-                logger.error(f"Error in '{search_query}': {e}. Retrying in {wait}s ({consecutive_errors}/{MAX_CONSECUTIVE_ERRORS})...")
+                logger.error(
+                    "Error in '%s': %s. Retrying in %ds (%d/%d)...",
+                    search_query, e, wait, consecutive_errors, MAX_CONSECUTIVE_ERRORS,
+                )
                 await asyncio.sleep(wait)
+
+        last_write = await self._flush(
+            worker_id, buffered, min_stars, max_stars, ranges,
+        ) or last_write
+        # Stay busy until the range's rows are written, so a failed write can re-queue it
+        if last_write:
+            await last_write
+
+    async def _flush(
+        self, worker_id, rows, min_stars, max_stars, ranges,
+    ) -> asyncio.Future | None:
+        """
+        Queue `rows` for the writer, waiting only while the queue is full.
+        Returns a future resolved once the batch has been written (or re-queued).
+        """
+        if not rows:
+            return None
+        written = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((worker_id, rows, min_stars, max_stars, ranges, written))
+        return written
+
+    def _take_unseen(self, rows, limit):
+        """
+        Take up to `limit` rows whose id wasn't written recently (e.g. a page
+        re-fetched after a retry), consuming `rows` only as far as needed.
+        """
+        seen = self._seen_ids
+        fresh = []
+        for row in rows:
+            repo_id = row['id']
+            if repo_id in seen:
+                continue
+            seen[repo_id] = None
+            fresh.append(row)
+            if len(fresh) >= limit:
+                break
+        while len(seen) > SEEN_IDS_CAPACITY:
+            seen.popitem(last=False)
+        return fresh
+
+    async def _writer(self) -> None:
+        """Single consumer that owns the DB connection and writes queued batches in order."""
+        async with self.db_repository.connect() as conn:
+            while (batch := await self._write_queue.get()) is not None:
+                worker_id, rows, min_stars, max_stars, ranges, written = batch
+                try:
+                    await self.db_repository.bulk_upsert(conn, rows)
+                except Exception as e:
+                    self._requeue_failed_write(worker_id, rows, min_stars, max_stars, ranges, e)
+                else:
+                    # Only consecutive failures count towards giving up on the range
+                    self._write_failures.pop((min_stars, max_stars), None)
+                finally:
+                    written.set_result(None)
+
+    def _requeue_failed_write(self, worker_id, rows, min_stars, max_stars, ranges, error) -> None:
+        """
+        Undo a failed batch's bookkeeping and re-queue its range for another crawl,
+        giving up on the range after MAX_CONSECUTIVE_ERRORS failed writes in a row.
+        """
+        self._per_worker_fetched[worker_id] -= len(rows)
+        # Forget the ids so the re-crawled range isn't filtered out as duplicates
+        for row in rows:
+            self._seen_ids.pop(row['id'], None)
+        if self._total_fetched < self.target_count:
+            self._target_reached.clear()
+
+        star_range = (min_stars, max_stars)
+        failures = self._write_failures.get(star_range, 0) + 1
+        self._write_failures[star_range] = failures
+        if failures >= MAX_CONSECUTIVE_ERRORS:
+            logger.error(
+                "Upsert failed for 'stars:%d..%d': %s. Too many failed writes. Skipping range.",
+                min_stars, max_stars, error,
+            )
+        else:
+            logger.error(
+                "Upsert failed for 'stars:%d..%d': %s. Re-queueing range (%d/%d).",
+                min_stars, max_stars, error, failures, MAX_CONSECUTIVE_ERRORS,
+            )
+            ranges.appendleft(star_range)
+        self._work_available.set()
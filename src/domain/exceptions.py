@@ -8,6 +8,12 @@ class RateLimitExceededException(CrawlerException):
         self.reset_at = reset_at
         super().__init__(f"{message} Resets at: {reset_at}")
 
+class CircuitOpenException(CrawlerException):
+    """Raised when repeated GitHub failures have opened the client's circuit breaker."""
+    def __init__(self, retry_after: float, message: str = "GitHub API circuit breaker is open."):
+        self.retry_after = retry_after
+        super().__init__(f"{message} Retry in {retry_after:.0f}s.")
+
 class DatabaseException(CrawlerException):
     """Raised when a database operation fails."""
     pass
\ No newline at end of file
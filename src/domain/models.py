@@ -8,7 +8,8 @@ class RepositoryEntity(BaseModel):
     This is the core entity used throughout the application.
     """
     # Enforces immutability: once created, fields cannot be modified.
-    model_config = ConfigDict(frozen=True)
+    # Unknown fields are rejected and, being frozen, assignment is never validated.
+    model_config = ConfigDict(frozen=True, extra='forbid', validate_assignment=False)
 
     id: str = Field(..., description="The unique GraphQL Node ID from GitHub")
     name: str = Field(..., description="Name of the repository")
@@ -18,4 +19,4 @@ class RepositoryEntity(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(
         default_factory=dict, 
         description="Flexible JSON payload for future metadata (issues, PRs, etc.)"
-    )
\ No newline at end of file
+    )
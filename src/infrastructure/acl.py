@@ -1,8 +1,19 @@
-from datetime import datetime
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import ciso8601
 
 from src.domain.models import RepositoryEntity
 
+
+# Repos in the same page often share a second-resolution updatedAt, so cache parses.
+# ciso8601 is a C parser that handles the trailing 'Z' and raises ValueError on bad input.
+_parse_timestamp = lru_cache(maxsize=1024)(ciso8601.parse_datetime)
+
+# Shared by every entity instead of a fresh dict per instance; never mutated.
+_EMPTY_META: Dict[str, Any] = {}
+
+
 class GitHubTranslator:
     """
     Anti-corruption layer that translates raw GitHub GraphQL JSON responses into RepositoryEntity instances.
@@ -18,22 +29,68 @@ class GitHubTranslator:
         
         Returns:
             RepositoryEntity: The domain model instance representing the repository.
+
+        Raises:
+            ValueError: If a required field is missing or null in the node.
         """
-        
-        # Extract nested fields with safe defaults
-        owner_data = raw_node.get('owner', {})
-        stargazers_data = raw_node.get('stargazers', {})
-
-        raw_date = raw_node.get('updatedAt')
-        if not raw_date:
-            raise ValueError("updatedAt is required to build RepositoryEntity.")
-        updated_at_dt = datetime.fromisoformat(raw_date.replace("Z", "+00:00"))
-
-        return RepositoryEntity(
-            id=raw_node.get('id', ''),
-            name=raw_node.get('name', ''),
-            owner=owner_data.get('login', ''),
-            stars=stargazers_data.get('totalCount', 0),
-            updated_at=updated_at_dt,
-            metadata={}
-        )
+        # Well-formed nodes always carry every field, so index directly and
+        # translate the rare miss instead of paying for .get() chains.
+        try:
+            # Fields are already shaped by the GraphQL query, so skip Pydantic validation
+            return RepositoryEntity.model_construct(
+                id=raw_node['id'],
+                name=raw_node['name'],
+                owner=raw_node['owner']['login'],
+                stars=raw_node['stargazerCount'],
+                updated_at=_parse_timestamp(raw_node['updatedAt']),
+                metadata=_EMPTY_META,
+            )
+        except KeyError as e:
+            raise ValueError(f"{e.args[0]} is required to build RepositoryEntity.") from e
+        except TypeError as e:
+            # A null where an object (owner) or a string (updatedAt) is expected
+            raise ValueError(f"Malformed node, cannot build RepositoryEntity: {e}") from e
+
+    @staticmethod
+    def to_row_safe(raw_node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Transforms a raw GitHub GraphQL node directly into a `github_repositories` row.
+        Used on the bulk-ingest path, where building a RepositoryEntity only to
+        project it back into a dict would be wasted work. A malformed node yields
+        None instead of raising, so it can be skipped without failing the page.
+
+        Args:
+            raw_node (Dict[str, Any]): The raw JSON node from GitHub's GraphQL response.
+
+        Returns:
+            Optional[Dict[str, Any]]: Column values keyed by `github_repositories` column
+            name, or None if a required field is missing or invalid.
+        """
+        try:
+            return {
+                'id': raw_node['id'],
+                'name': raw_node['name'],
+                'owner': raw_node['owner']['login'],
+                'stars': raw_node['stargazerCount'],
+                'updated_at': _parse_timestamp(raw_node['updatedAt']),
+            }
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def to_rows(raw_nodes: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily transforms a page of raw GitHub GraphQL nodes into `github_repositories`
+        rows, skipping empty (non-Repository) and malformed nodes. Nodes are only
+        translated as rows are consumed, so a caller can stop early.
+
+        Args:
+            raw_nodes (Iterable[Dict[str, Any]]): Raw JSON nodes from GitHub's GraphQL response.
+
+        Returns:
+            Iterator[Dict[str, Any]]: One row per well-formed node.
+        """
+        to_row_safe = GitHubTranslator.to_row_safe
+        for node in raw_nodes:
+            if node and (row := to_row_safe(node)) is not None:
+                yield row
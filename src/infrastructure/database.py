@@ -1,9 +1,9 @@
-from typing import List
-from sqlalchemy.ext.asyncio import create_async_engine
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
 from sqlalchemy.dialects.postgresql import insert, JSONB
-from sqlalchemy import Table, Column, String, Integer, DateTime, MetaData, text
-
-from src.domain.models import RepositoryEntity
+from sqlalchemy import Table, Column, String, Integer, DateTime, MetaData, text, table, column, select, tuple_
 
 # SQLAlchemy core Table definition
 metadata = MetaData()
@@ -18,46 +18,78 @@ repos_table = Table(
     Column('metadata', JSONB, server_default=text("'{}'::jsonb")),
 )
 
+# Session-local staging table that COPY loads into before the merge. It is created once
+# per connection and emptied at each commit, so batches don't churn the system catalogs.
+STAGE_COLUMNS = ('id', 'name', 'owner', 'stars', 'updated_at')
+stage_table = table('github_repositories_stage', *(column(name) for name in STAGE_COLUMNS))
+CREATE_STAGE_SQL = text(
+    "CREATE TEMP TABLE IF NOT EXISTS github_repositories_stage "
+    "(LIKE github_repositories INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+)
+# Pulls a row's COPY record in one C-level call
+_stage_record = itemgetter(*STAGE_COLUMNS)
+
+# Built once: the SQL is identical for every batch, so SQLAlchemy's compiled cache
+# and asyncpg's prepared-statement cache are hit on every page.
+_stage_insert = insert(repos_table).from_select(
+    list(STAGE_COLUMNS), select(*(stage_table.c[name] for name in STAGE_COLUMNS)),
+)
+# Only update (and bump crawled_at) if the incoming stars or updated_at differ from the
+# existing ones; unchanged rows are skipped entirely, so no dead tuple or WAL is written.
+UPSERT_FROM_STAGE = _stage_insert.on_conflict_do_update(
+    index_elements=['id'],
+    set_={
+        'stars': _stage_insert.excluded.stars,
+        'updated_at': _stage_insert.excluded.updated_at,
+        'crawled_at': text('NOW()'),
+    },
+    where=tuple_(repos_table.c.stars, repos_table.c.updated_at).is_distinct_from(
+        tuple_(_stage_insert.excluded.stars, _stage_insert.excluded.updated_at)
+    ),
+)
+
 class PostgresRepository:
     """
     Repository class for interacting with the PostgreSQL database.
-    Handles batch insertion of RepositoryEntity instances.
+    Handles batch insertion of repository rows.
     """
 
     def __init__(self, db_url: str):
         self.engine = create_async_engine(db_url, echo=False)
 
-    async def bulk_upsert(self, entities: List[RepositoryEntity]) -> None:
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[AsyncConnection]:
+        """
+        Checks out a long-lived connection for a series of `bulk_upsert` calls,
+        so callers don't pay a pool checkout per batch.
         """
-        Inserts multiple RepositoryEntity instances into the database in a single batch operation.
+        async with self.engine.connect() as conn:
+            yield conn
+
+    async def bulk_upsert(self, conn: AsyncConnection, rows: List[Dict[str, Any]]) -> None:
+        """
+        Inserts multiple repository rows into the database in a single transaction.
+
+        Rows are bulk-loaded with COPY into a temporary staging table and merged
+        into `github_repositories` with one INSERT ... SELECT ... ON CONFLICT,
+        so the statement Postgres parses is the same regardless of batch size.
         
         Args:
-            entities (List[RepositoryEntity]): List of repository entities to insert.
+            conn (AsyncConnection): Connection obtained from `connect()`.
+            rows (List[Dict[str, Any]]): Rows keyed by column name, as built by `GitHubTranslator.to_rows`.
         """
-        if not entities:
-            return  # No entities to insert
-        
-        values = [
-            {   'id': entity.id,
-                'name': entity.name,
-                'owner': entity.owner,
-                'stars': entity.stars,
-                'updated_at': entity.updated_at,
-            } for entity in entities
-        ]
-
-        async with self.engine.begin() as conn:
-            stmt = insert(repos_table).values(values)
-
-            # Only update if the incoming stars or updated_at are different from the existing ones.
-            upsert_stmt = stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_={
-                    'stars': stmt.excluded.stars,
-                    'updated_at': stmt.excluded.updated_at,
-                    'crawled_at': text('NOW()'),
-                },
-                where=(repos_table.c.stars.is_distinct_from(stmt.excluded.stars) | repos_table.c.updated_at.is_distinct_from(stmt.excluded.updated_at))
+        if not rows:
+            return  # No rows to insert
+
+        records = list(map(_stage_record, rows))
+
+        async with conn.begin():
+            # Executing through SQLAlchemy first opens the transaction the COPY joins;
+            # after the connection's first batch this is a no-op
+            await conn.execute(CREATE_STAGE_SQL)
+            raw_conn = await conn.get_raw_connection()
+            await raw_conn.driver_connection.copy_records_to_table(
+                stage_table.name, records=records, columns=STAGE_COLUMNS,
             )
 
-            await conn.execute(upsert_stmt)
+            await conn.execute(UPSERT_FROM_STAGE)
@@ -1,10 +1,23 @@
 import aiohttp
 import asyncio
+import hashlib
 import logging
 import random
-from typing import Dict, Any, Tuple, List
+import time
+import orjson
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Any, Mapping, Tuple, List, Optional
 
-from src.domain.exceptions import RateLimitExceededException
+try:
+    import httpx
+except ImportError:  # HTTP/2 transport is optional (the 'http2' extra)
+    httpx = None
+
+from src.domain.exceptions import CircuitOpenException, RateLimitExceededException
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
 
 logger = logging.getLogger(__name__)
 
@@ -26,25 +39,92 @@ query ($cursor: String, $searchQuery: String!, $pageSize: Int!) {
         owner {
           login
         }
-        stargazers {
-          totalCount
-        }
+        stargazerCount
         updatedAt
       }
     }
   }
   rateLimit {
-    cost
     remaining
     resetAt
   } 
 }
 """
 
+# The query text never changes, so its JSON encoding is done once at import;
+# only the variables are serialised per request. GitHub's API has no persisted-query
+# (APQ) support, so the full document has to be sent with every request.
+_PAYLOAD_PREFIX = b'{"query":' + orjson.dumps(GRAPHQL_QUERY) + b',"variables":'
+
+# The token check takes no variables, so its whole request body is fixed
+VALIDATE_QUERY = "{ viewer { login } rateLimit { remaining resetAt } }"
+_VALIDATE_PAYLOAD = orjson.dumps({"query": VALIDATE_QUERY})
+
 DEFAULT_PAGE_SIZE = 25
 MIN_PAGE_SIZE = 5
+# Consecutive successful pages before the page size grows back by one (AIMD)
+PAGE_SIZE_GROWTH_STREAK = 5
 REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+# Warm-up request on entry; short, since a failure here only costs the cold start
+PRECONNECT_URL = "https://api.github.com/"
+PRECONNECT_TIMEOUT = aiohttp.ClientTimeout(total=5)
 MAX_RETRIES = 7
+# Full-jitter backoff bounds: each retry sleeps uniformly in [0, min(MAX_DELAY, BASE_DELAY * 2**attempt)]
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+# Pooled connections for the client's lifetime; every request goes to api.github.com
+CONNECTOR_LIMIT = 32
+CONNECTOR_LIMIT_PER_HOST = 16
+# Keep resolved addresses and idle TLS connections around so bursts skip DNS and handshakes
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 75
+# Consecutive 5xx/network failures that open the circuit breaker, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN_SECONDS = 30.0
+# While the half-open probe is in flight, other callers are told to retry after this long
+CIRCUIT_PROBE_WAIT_SECONDS = 2.0
+# Secondary (abuse) rate limits: wait for Retry-After, then retry
+_ABUSE_STATUSES = frozenset({403, 429})
+# Transient server errors: shrink the page and back off
+_RETRY_STATUSES = frozenset({500, 502, 503, 504})
+# Upper bound on concurrent GraphQL requests from one client, whatever the caller's fan-out
+MAX_IN_FLIGHT_REQUESTS = 10
+# How long a cached search page may be re-served to later runs
+CACHE_TTL_SECONDS = 3600
+CACHE_KEY_PREFIX = "gh:"
+
+
+@dataclass(slots=True, frozen=True)
+class PageResult:
+    """
+    One page of search results. Pages served from the response cache cost no
+    points and report None for both rate-limit fields.
+    """
+    nodes: List[Dict[str, Any]]
+    end_cursor: Optional[str]
+    has_next: bool
+    repo_count: int
+    rate_remaining: Optional[int] = None
+    rate_reset_at: Optional[str] = None
+
+
+class _UnexpectedStatus(Exception):
+    """An HTTP error status with no specific handling; retried like a network failure."""
+
+
+class _MalformedResponse(Exception):
+    """A 200 response whose body carries neither data nor errors; retried like a network failure."""
+
+
+# Failures retried with backoff, whichever transport produced them. A body that
+# isn't JSON (e.g. a proxy's error page) is treated the same way.
+_TRANSIENT_ERRORS: Tuple[type, ...] = (
+    aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError,
+    _UnexpectedStatus, _MalformedResponse,
+)
+if httpx is not None:
+    _TRANSIENT_ERRORS += (httpx.TransportError,)
+
 
 class GitHubGraphQLClient:
     """
@@ -52,113 +132,301 @@ class GitHubGraphQLClient:
     Handles authentication, query execution, and rate limit management.
     """
 
-    def __init__(self, token: str):
+    def __init__(
+        self,
+        token: str,
+        max_in_flight: int = MAX_IN_FLIGHT_REQUESTS,
+        cache: Optional["Redis"] = None,
+        http2: bool = False,
+    ):
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/vnd.github+json",
             "User-Agent": "github-crawler-sofstica",
             "X-GitHub-Api-Version": "2022-11-28",
+            "Accept-Encoding": "gzip, br",
         }
+        # fetch_page posts pre-serialised bytes, so the content type must be explicit
+        self._post_headers = {"Content-Type": "application/json"}
         self.api_url = "https://api.github.com/graphql"
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # With http2, requests go through one multiplexed httpx connection instead of aiohttp
+        if http2 and httpx is None:
+            raise RuntimeError("HTTP/2 transport requires httpx. Install the 'http2' extra.")
+        self._http2 = http2
+        self._http2_client: Optional["httpx.AsyncClient"] = None
+        # Page size shared by every caller: halved on failure, regrown one step at a time
+        self._page_size = DEFAULT_PAGE_SIZE
+        self._success_streak = 0
+        # Circuit breaker shared by every caller; while open, requests fail fast
+        self._consecutive_failures = 0
+        self._breaker_open_until = 0.0
+        self._probe_in_flight = False
+        # Optional response cache (redis.asyncio), shared across crawler runs
+        self._cache = cache
+
+    async def __aenter__(self) -> "GitHubGraphQLClient":
+        await self._preconnect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the client's shared session, creating it on first use so TCP and
+        TLS handshakes are paid once and amortised across every page fetch.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=CONNECTOR_LIMIT,
+                    limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+                    ttl_dns_cache=DNS_CACHE_TTL,
+                    keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ),
+                timeout=REQUEST_TIMEOUT,
+                headers=self.headers,
+            )
+        return self._session
+
+    def _get_http2_client(self) -> "httpx.AsyncClient":
+        """Return the shared HTTP/2 client, creating it on first use."""
+        if self._http2_client is None:
+            self._http2_client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT.total, connect=REQUEST_TIMEOUT.connect),
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=CONNECTOR_LIMIT,
+                    max_keepalive_connections=CONNECTOR_LIMIT_PER_HOST,
+                    keepalive_expiry=KEEPALIVE_TIMEOUT,
+                ),
+            )
+        return self._http2_client
+
+    async def _post(self, body: bytes) -> Tuple[int, Mapping[str, str], bytes]:
+        """POST a GraphQL body over the configured transport and return (status, headers, content)."""
+        if self._http2:
+            response = await self._get_http2_client().post(
+                self.api_url, content=body, headers=self._post_headers,
+            )
+            return response.status_code, response.headers, response.content
+        session = await self._get_session()
+        async with session.post(self.api_url, data=body, headers=self._post_headers) as response:
+            return response.status, response.headers, await response.read()
+
+    async def _preconnect(self) -> None:
+        """
+        Resolve DNS and complete the TLS handshake up front, leaving a warm
+        connection in the pool for the first real request. Failures are ignored.
+        """
+        try:
+            if self._http2:
+                await self._get_http2_client().head(PRECONNECT_URL, timeout=PRECONNECT_TIMEOUT.total)
+            else:
+                session = await self._get_session()
+                async with session.head(PRECONNECT_URL, timeout=PRECONNECT_TIMEOUT):
+                    pass
+        except _TRANSIENT_ERRORS as e:
+            logger.debug("Preconnect to %s failed: %s", PRECONNECT_URL, e)
 
-    async def validate_token(self, session: aiohttp.ClientSession) -> None:
+    async def aclose(self) -> None:
+        """Close the shared session and its pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._http2_client is not None:
+            await self._http2_client.aclose()
+            self._http2_client = None
+
+    def _decrease_page_size(self, page_size: int) -> int:
+        """Halve the page size after a failed request (multiplicative decrease)."""
+        self._success_streak = 0
+        self._page_size = max(page_size // 2, MIN_PAGE_SIZE)
+        return self._page_size
+
+    def _check_circuit(self) -> bool:
+        """
+        Fail fast while the breaker is open. Once the cooldown passes it is half-open:
+        one probe request goes through and every other caller keeps failing fast until
+        the probe settles. Returns True for the probe.
+        """
+        if self._consecutive_failures < CIRCUIT_FAILURE_THRESHOLD:
+            return False
+        retry_after = self._breaker_open_until - time.monotonic()
+        if retry_after > 0 or self._probe_in_flight:
+            raise CircuitOpenException(retry_after=max(retry_after, CIRCUIT_PROBE_WAIT_SECONDS))
+        self._probe_in_flight = True
+        return True
+
+    def _record_failure(self) -> None:
+        """Count a 5xx/network failure, opening the breaker at the threshold."""
+        self._consecutive_failures += 1
+        # The count isn't reset when the breaker opens, so a failed probe re-opens it at once
+        if self._consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self._breaker_open_until = time.monotonic() + CIRCUIT_COOLDOWN_SECONDS
+            logger.warning(
+                "%d consecutive GitHub failures. Opening circuit for %.0fs.",
+                self._consecutive_failures, CIRCUIT_COOLDOWN_SECONDS,
+            )
+
+    def _record_success(self) -> None:
+        """Close the breaker and grow the page size by one after a streak of successes (additive increase)."""
+        self._consecutive_failures = 0
+        self._success_streak += 1
+        if self._success_streak >= PAGE_SIZE_GROWTH_STREAK and self._page_size < DEFAULT_PAGE_SIZE:
+            self._page_size += 1
+            self._success_streak = 0
+
+    @staticmethod
+    def _cache_key(variables: Dict[str, Any]) -> str:
+        return CACHE_KEY_PREFIX + hashlib.sha256(orjson.dumps(variables)).hexdigest()
+
+    async def _cache_get(self, key: str) -> Optional[list]:
+        """Return a cached (nodes, end_cursor, has_next_page, repository_count) page, if any."""
+        try:
+            cached = await self._cache.get(key)
+        except Exception as e:
+            # The cache is an optimisation; an unreachable Redis must not stop the crawl
+            logger.warning("Response cache read failed: %s", e)
+            return None
+        return orjson.loads(cached) if cached is not None else None
+
+    async def _cache_put(self, key: str, page: tuple) -> None:
+        try:
+            await self._cache.setex(key, CACHE_TTL_SECONDS, orjson.dumps(page))
+        except Exception as e:
+            logger.warning("Response cache write failed: %s", e)
+
+    async def validate_token(self) -> None:
         """Verify the token works before starting a long crawl."""
-        payload = {"query": "{ viewer { login } rateLimit { remaining resetAt } }"}
-        async with session.post(self.api_url, json=payload, headers=self.headers, timeout=REQUEST_TIMEOUT) as response:
-            body = await response.json()
-            if response.status != 200 or 'errors' in body:
-                raise RuntimeError(
-                    f"GitHub token validation failed (HTTP {response.status}): {body}. "
-                    "Ensure GITHUB_TOKEN is a valid Personal Access Token."
-                )
-            viewer = body.get('data', {}).get('viewer', {}).get('login')
-            rate = body.get('data', {}).get('rateLimit', {})
-            logger.info(f"Authenticated as '{viewer}'. Rate limit remaining: {rate.get('remaining')}")
+        status, _, content = await self._post(_VALIDATE_PAYLOAD)
+        body = orjson.loads(content)
+        if status != 200 or 'errors' in body:
+            raise RuntimeError(
+                f"GitHub token validation failed (HTTP {status}): {body}. "
+                "Ensure GITHUB_TOKEN is a valid Personal Access Token."
+            )
+        viewer = body.get('data', {}).get('viewer', {}).get('login')
+        rate = body.get('data', {}).get('rateLimit', {})
+        logger.info("Authenticated as '%s'. Rate limit remaining: %s", viewer, rate.get('remaining'))
 
     async def fetch_page(
         self,
-        session: aiohttp.ClientSession,
         cursor: str = None,
         search_query: str = "stars:>=1000",
-        page_size: int = DEFAULT_PAGE_SIZE,
-    ) -> Tuple[List[Dict], str, bool, int]:
+        page_size: Optional[int] = None,
+    ) -> PageResult:
         """
-        Fetches a single page of repositories from GitHub.
+        Fetches a single page of repositories from GitHub. Without an explicit
+        page_size, the client's adaptive page size is used.
 
         Returns:
-            Tuple of (nodes, end_cursor, has_next_page, repository_count).
+            PageResult with the page's nodes, pagination state, repository count
+            and the rate-limit budget reported alongside it.
         """
-        current_page_size = page_size
+        current_page_size = page_size or self._page_size
+
+        # Built once per call; retries only change the page size
+        variables = {"cursor": cursor, "searchQuery": search_query, "pageSize": current_page_size}
+
+        if self._cache is not None:
+            cached = await self._cache_get(self._cache_key(variables))
+            if cached is not None:
+                return PageResult(*cached)
 
         for attempt in range(MAX_RETRIES):
-          payload = {
-              "query": GRAPHQL_QUERY,
-              "variables": {"cursor": cursor, "searchQuery": search_query, "pageSize": current_page_size},
-          }
+          variables["pageSize"] = current_page_size
+          request_body = _PAYLOAD_PREFIX + orjson.dumps(variables) + b'}'
           try:
-            async with session.post(self.api_url, json=payload, headers=self.headers, timeout=REQUEST_TIMEOUT) as response:
-                # Handle secondary rate limit (abuse detection)
-                if response.status == 403:
-                  body = await response.text()
-                  retry_after = response.headers.get('Retry-After')
-                  sleep_time = int(retry_after) if retry_after else 60
-                  logger.warning(f"Secondary rate limit (403). Body: {body[:200]}. Sleeping {sleep_time}s...")
-                  await asyncio.sleep(sleep_time)
-                  continue
-
-                if response.status in {500, 502, 503, 504}:
-                  body = await response.text()
-                  # Check if this is actually a rate limit error disguised as 5xx
-                  remaining_header = response.headers.get('x-ratelimit-remaining')
-                  if remaining_header == '0':
-                      reset_header = response.headers.get('x-ratelimit-reset', '')
-                      from datetime import datetime, timezone
-                      reset_at = datetime.fromtimestamp(int(reset_header), tz=timezone.utc).isoformat() if reset_header else 'unknown'
-                      raise RateLimitExceededException(reset_at=reset_at)
-                  current_page_size = max(current_page_size // 2, MIN_PAGE_SIZE)
-                  sleep_time = (2 ** attempt) + random.uniform(0, 2)
-                  logger.warning(
-                      f"Server error ({response.status}). Body: {body[:200]}. "
-                      f"Reducing page size to {current_page_size}, "
-                      f"retrying in {sleep_time:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})..."
-                  )
-                  await asyncio.sleep(sleep_time)
-                  continue
-
-                response.raise_for_status()
-                data = await response.json()
-
-                # Handle GraphQL-level errors (can occur even with HTTP 200)
-                if 'errors' in data:
-                    error_msg = data['errors'][0].get('message', 'Unknown GraphQL error')
-                    if 'data' not in data or data['data'] is None:
-                        current_page_size = max(current_page_size // 2, MIN_PAGE_SIZE)
-                        sleep_time = (2 ** attempt) + random.uniform(0, 2)
-                        logger.warning(f"GraphQL error: {error_msg}. Retrying in {sleep_time:.1f}s...")
-                        await asyncio.sleep(sleep_time)
-                        continue
-                    logger.warning(f"GraphQL partial error: {error_msg}")
-
-                rate_limit = data.get('data', {}).get('rateLimit', {})
-                remaining = rate_limit.get('remaining', 100)
-
-                if remaining < 10:
-                    reset_at = rate_limit.get('resetAt')
-                    raise RateLimitExceededException(reset_at=reset_at)
-
-                search_data = data.get('data', {}).get('search', {})
-                nodes = search_data.get('nodes', [])
-                page_info = search_data.get('pageInfo', {})
-                repo_count = search_data.get('repositoryCount', 0)
-
-                return nodes, page_info.get('endCursor'), page_info.get('hasNextPage', False), repo_count
-
-          except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-              current_page_size = max(current_page_size // 2, MIN_PAGE_SIZE)
-              sleep_time = (2 ** attempt) + random.uniform(0, 2)
+            probe = self._check_circuit()
+            try:
+                async with self._in_flight:
+                    status, headers, content = await self._post(request_body)
+            finally:
+                # The probe's outcome is recorded below; a 5xx or network error re-opens the breaker
+                if probe:
+                    self._probe_in_flight = False
+
+            # Handle secondary rate limit (abuse detection)
+            if status in _ABUSE_STATUSES:
+              retry_after = headers.get('Retry-After')
+              sleep_time = int(retry_after) if retry_after else 60
+              logger.warning("Secondary rate limit (%d). Sleeping %ds...", status, sleep_time)
+              # Response bodies only matter when debugging; %.200r truncates without slicing
+              logger.debug("Secondary rate limit body: %.200r", content)
+              await asyncio.sleep(sleep_time)
+              continue
+
+            if status in _RETRY_STATUSES:
+              # Check if this is actually a rate limit error disguised as 5xx
+              remaining_header = headers.get('x-ratelimit-remaining')
+              if remaining_header == '0':
+                  reset_header = headers.get('x-ratelimit-reset', '')
+                  reset_at = datetime.fromtimestamp(int(reset_header), tz=timezone.utc).isoformat() if reset_header else None
+                  raise RateLimitExceededException(reset_at=reset_at)
+              self._record_failure()
+              current_page_size = self._decrease_page_size(current_page_size)
+              sleep_time = random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+              logger.warning(
+                  "Server error (%d). Reducing page size to %d, retrying in %.1fs (attempt %d/%d)...",
+                  status, current_page_size, sleep_time, attempt + 1, MAX_RETRIES,
+              )
+              logger.debug("Server error body: %.200r", content)
+              await asyncio.sleep(sleep_time)
+              continue
+
+            if status >= 400:
+                raise _UnexpectedStatus(f"HTTP {status}: {content[:200].decode(errors='replace')}")
+
+            # Pages are at most DEFAULT_PAGE_SIZE nodes (a few KB compressed), and rateLimit
+            # follows search in the body, so one buffered orjson parse beats streaming it
+            payload = orjson.loads(content)
+
+            # Handle GraphQL-level errors (can occur even with HTTP 200)
+            if 'errors' in payload:
+                error_msg = payload['errors'][0].get('message', 'Unknown GraphQL error')
+                if payload.get('data') is None:
+                    current_page_size = self._decrease_page_size(current_page_size)
+                    sleep_time = random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+                    logger.warning("GraphQL error: %s. Retrying in %.1fs...", error_msg, sleep_time)
+                    await asyncio.sleep(sleep_time)
+                    continue
+                logger.warning("GraphQL partial error: %s", error_msg)
+
+            # Resolve 'data' once and read only the paths the crawler uses
+            data = payload.get('data')
+            if data is None:
+                raise _MalformedResponse(f"No data in response: {content[:200].decode(errors='replace')}")
+            rate_limit = data.get('rateLimit') or {}
+            remaining = rate_limit.get('remaining', 100)
+            reset_at = rate_limit.get('resetAt')
+
+            search_data = data.get('search') or {}
+            page_info = search_data.get('pageInfo') or {}
+            self._record_success()
+
+            nodes = search_data.get('nodes') or []
+            end_cursor = page_info.get('endCursor')
+            has_next = page_info.get('hasNextPage', False)
+            repo_count = search_data.get('repositoryCount', 0)
+            # Only non-empty pages are worth re-serving; rate fields are never cached
+            if self._cache is not None and nodes:
+                await self._cache_put(self._cache_key(variables), (nodes, end_cursor, has_next, repo_count))
+
+            return PageResult(nodes, end_cursor, has_next, repo_count, remaining, reset_at)
+
+          except _TRANSIENT_ERRORS as e:
+              # A 4xx says nothing about GitHub's health, so only network faults trip the breaker
+              if not isinstance(e, _UnexpectedStatus):
+                  self._record_failure()
+              current_page_size = self._decrease_page_size(current_page_size)
+              sleep_time = random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
               logger.warning(
-                  f"Request failed (attempt {attempt + 1}/{MAX_RETRIES}): {e}. "
-                  f"Reducing page size to {current_page_size}, retrying in {sleep_time:.1f}s..."
+                  "Request failed (attempt %d/%d): %s. Reducing page size to %d, retrying in %.1fs...",
+                  attempt + 1, MAX_RETRIES, e, current_page_size, sleep_time,
               )
               await asyncio.sleep(sleep_time)
 
@@ -4,6 +4,11 @@ import sys
 import logging
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 from src.infrastructure.github_client import GitHubGraphQLClient
 from src.infrastructure.database import PostgresRepository
 from src.application.crawler_service import CrawlerService
@@ -34,8 +39,22 @@ async def main():
         logger.error("DATABASE_URL is not set in the environment.")
         sys.exit(1)
 
+    # Optional response cache; redis is only needed when REDIS_URL is set
+    cache = None
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            logger.error("REDIS_URL is set but redis is not installed. Install the 'cache' extra.")
+            sys.exit(1)
+        cache = Redis.from_url(redis_url)
+
+    # Opt into the multiplexed HTTP/2 transport (requires the 'http2' extra)
+    use_http2 = os.getenv("GITHUB_HTTP2", "").lower() in ("1", "true", "yes")
+
     # Initialize the GitHub client and database repository
-    github_client = GitHubGraphQLClient(token=github_token)
+    github_client = GitHubGraphQLClient(token=github_token, cache=cache, http2=use_http2)
     db_repository = PostgresRepository(db_url=db_url)
 
     # Create the crawler service and start crawling
@@ -46,12 +65,21 @@ async def main():
     )
 
     try:
-        await crawler_service.crawl()
+        # The client owns a pooled HTTP session; close it however the crawl ends
+        async with github_client:
+            await crawler_service.crawl()
     except KeyboardInterrupt:
         logger.info("Crawl interrupted by user. Exiting gracefully.")
     except Exception as e:
         logger.exception(f"An unexpected error occurred: {e}")  
         sys.exit(1)
+    finally:
+        if cache is not None:
+            await cache.aclose()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Prefer the libuv-backed event loop: cheaper per-await scheduling and socket I/O
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
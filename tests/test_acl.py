@@ -10,7 +10,7 @@ class TestGitHubTranslator(unittest.TestCase):
             "id": "repo-1",
             "name": "example",
             "owner": {"login": "octocat"},
-            "stargazers": {"totalCount": 123},
+            "stargazerCount": 123,
             "updatedAt": "2024-01-02T03:04:05Z",
         }
 
@@ -28,8 +28,79 @@ class TestGitHubTranslator(unittest.TestCase):
             "id": "repo-1",
             "name": "example",
             "owner": {"login": "octocat"},
-            "stargazers": {"totalCount": 123},
+            "stargazerCount": 123,
         }
 
         with self.assertRaises(ValueError):
             GitHubTranslator.to_domain(raw_node)
+
+    def test_null_fields_raise_value_error(self) -> None:
+        raw_node = {
+            "id": "repo-1",
+            "name": "example",
+            "owner": {"login": "octocat"},
+            "stargazerCount": 123,
+            "updatedAt": "2024-01-02T03:04:05Z",
+        }
+
+        for field in ("owner", "updatedAt"):
+            with self.subTest(field=field), self.assertRaises(ValueError):
+                GitHubTranslator.to_domain({**raw_node, field: None})
+
+    def test_to_row_matches_table_columns(self) -> None:
+        raw_node = {
+            "id": "repo-1",
+            "name": "example",
+            "owner": {"login": "octocat"},
+            "stargazerCount": 123,
+            "updatedAt": "2024-01-02T03:04:05Z",
+        }
+
+        row = GitHubTranslator.to_row_safe(raw_node)
+
+        self.assertEqual(
+            row,
+            {
+                "id": "repo-1",
+                "name": "example",
+                "owner": "octocat",
+                "stars": 123,
+                "updated_at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            },
+        )
+
+    def test_missing_owner_yields_no_row(self) -> None:
+        raw_node = {
+            "id": "repo-1",
+            "name": "example",
+            "stargazerCount": 123,
+            "updatedAt": "2024-01-02T03:04:05Z",
+        }
+
+        self.assertIsNone(GitHubTranslator.to_row_safe(raw_node))
+
+    def test_to_row_safe_returns_none_for_malformed_node(self) -> None:
+        raw_node = {
+            "id": "repo-1",
+            "name": "example",
+            "owner": {"login": "octocat"},
+            "stargazerCount": 123,
+            "updatedAt": "not-a-date",
+        }
+
+        self.assertIsNone(GitHubTranslator.to_row_safe(raw_node))
+        self.assertIsNone(GitHubTranslator.to_row_safe({"id": "repo-2"}))
+
+    def test_to_rows_skips_empty_and_malformed_nodes(self) -> None:
+        good = {
+            "id": "repo-1",
+            "name": "example",
+            "owner": {"login": "octocat"},
+            "stargazerCount": 123,
+            "updatedAt": "2024-01-02T03:04:05Z",
+        }
+
+        rows = list(GitHubTranslator.to_rows([good, {}, {"id": "repo-2"}, good]))
+
+        self.assertEqual([row["id"] for row in rows], ["repo-1", "repo-1"])
+        self.assertEqual(rows[0]["stars"], 123)
@@ -1,7 +1,32 @@
+import asyncio
 import unittest
-from unittest.mock import patch
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
 
-from src.application.crawler_service import CrawlerService, INITIAL_MIN_STARS
+from src.application.crawler_service import (
+    CrawlerService,
+    RateBudget,
+    INITIAL_MIN_STARS,
+    INITIAL_MAX_STARS,
+    MAX_CONSECUTIVE_ERRORS,
+)
+from src.domain.exceptions import CircuitOpenException, RateLimitExceededException
+from src.infrastructure.github_client import PageResult
+
+
+def _nodes(count, prefix="repo"):
+    return [
+        {
+            "id": f"{prefix}-{i}",
+            "name": f"{prefix}-{i}",
+            "owner": {"login": "octocat"},
+            "stargazerCount": 1,
+            "updatedAt": "2024-01-02T03:04:05Z",
+        }
+        for i in range(count)
+    ]
 
 
 class _FakeGitHubClient:
@@ -9,31 +34,39 @@ class _FakeGitHubClient:
         self.pages = pages
         self.calls = 0
 
-    async def validate_token(self, session):
+    async def validate_token(self):
         pass
 
-    async def fetch_page(self, session, cursor=None, search_query="", page_size=50):
+    async def fetch_page(self, cursor=None, search_query="", page_size=50):
         if self.calls >= len(self.pages):
-            return [], None, False, 0
+            return PageResult([], None, False, 0, 5000, None)
         page = self.pages[self.calls]
         self.calls += 1
-        return page
+        return PageResult(*page, 5000, None)
 
 
 class _FakeRepository:
     def __init__(self) -> None:
         self.total_entities = 0
+        self.batches = 0
+        self.connections = 0
+
+    @asynccontextmanager
+    async def connect(self):
+        self.connections += 1
+        yield None
 
-    async def bulk_upsert(self, entities) -> None:
-        self.total_entities += len(entities)
+    async def bulk_upsert(self, conn, rows) -> None:
+        self.total_entities += len(rows)
+        self.batches += 1
 
 
 class TestCrawlerService(unittest.IsolatedAsyncioTestCase):
     async def test_crawl_respects_ten_target(self) -> None:
-        node = {"id": "repo", "updatedAt": "2024-01-02T03:04:05Z"}
+        nodes = _nodes(12)
         pages = [
-            ([node] * 6, "cursor-1", True, 12),
-            ([node] * 6, None, False, 12),
+            (nodes[:6], "cursor-1", True, 12),
+            (nodes[6:], None, False, 12),
         ]
         github_client = _FakeGitHubClient(pages)
         db_repository = _FakeRepository()
@@ -44,20 +77,28 @@ class TestCrawlerService(unittest.IsolatedAsyncioTestCase):
             target_count=10,
         )
 
+        translated = []
+
+        def _counting_rows(nodes):
+            for node in nodes:
+                translated.append(node)
+                yield {"id": node["id"]}
+
         with patch(
-            "src.application.crawler_service.GitHubTranslator.to_domain",
-            return_value=object(),
+            "src.application.crawler_service.GitHubTranslator.to_rows",
+            side_effect=_counting_rows,
         ):
             await service.crawl()
 
         self.assertEqual(db_repository.total_entities, 10)
         self.assertEqual(github_client.calls, 2)
+        # Nodes beyond the target are never translated
+        self.assertEqual(len(translated), 10)
 
     async def test_crawl_respects_hundred_thousand_target(self) -> None:
-        node = {"id": "repo", "updatedAt": "2024-01-02T03:04:05Z"}
         # repo_count <= 1000 so no splitting is triggered
         pages = [
-            ([node] * 100000, None, False, 500),
+            (_nodes(100000), None, False, 500),
         ]
         github_client = _FakeGitHubClient(pages)
         db_repository = _FakeRepository()
@@ -68,31 +109,27 @@ class TestCrawlerService(unittest.IsolatedAsyncioTestCase):
             target_count=100000,
         )
 
-        with patch(
-            "src.application.crawler_service.GitHubTranslator.to_domain",
-            return_value=object(),
-        ):
-            await service.crawl()
+        await service.crawl()
 
         self.assertEqual(db_repository.total_entities, 100000)
         self.assertEqual(github_client.calls, 1)
 
     async def test_crawl_splits_large_range(self) -> None:
         """When a range has >1000 results, the crawler splits it."""
-        node = {"id": "repo", "updatedAt": "2024-01-02T03:04:05Z"}
+        full_range = f"stars:{INITIAL_MIN_STARS}..{INITIAL_MAX_STARS}"
 
         class _SplittingClient:
             def __init__(self):
                 self.queries = []
 
-            async def validate_token(self, session):
+            async def validate_token(self):
                 pass
 
-            async def fetch_page(self, session, cursor=None, search_query="", page_size=50):
+            async def fetch_page(self, cursor=None, search_query="", page_size=50):
                 self.queries.append(search_query)
-                if search_query == "stars:10..1000000":
-                    return [], None, False, 5000  # >1000 → triggers split
-                return [node] * 5, None, False, 5
+                if search_query == full_range:
+                    return PageResult([], None, False, 5000, 5000, None)  # >1000 → triggers split
+                return PageResult(_nodes(5, prefix=search_query), None, False, 5, 5000, None)
 
         client = _SplittingClient()
         db_repository = _FakeRepository()
@@ -103,18 +140,314 @@ class TestCrawlerService(unittest.IsolatedAsyncioTestCase):
             target_count=10,
         )
 
-        with patch(
-            "src.application.crawler_service.GitHubTranslator.to_domain",
-            return_value=object(),
-        ):
+        await service.crawl()
+
+        # First call is the full range, then the low-star half of a log-space split
+        mid = CrawlerService._split_point(INITIAL_MIN_STARS, INITIAL_MAX_STARS, 5000)
+        self.assertLess(mid - INITIAL_MIN_STARS, INITIAL_MAX_STARS - mid)
+        self.assertEqual(client.queries[0], full_range)
+        self.assertEqual(client.queries[1], f"stars:{INITIAL_MIN_STARS}..{mid}")
+        # The upper half's count (5000 - 5) is inferred, so it is split again without a query
+        upper_mid = CrawlerService._split_point(mid + 1, INITIAL_MAX_STARS, 5000 - 5)
+        self.assertNotIn(f"stars:{mid + 1}..{INITIAL_MAX_STARS}", client.queries)
+        self.assertEqual(client.queries[2], f"stars:{mid + 1}..{upper_mid}")
+        self.assertEqual(db_repository.total_entities, 10)
+
+    async def test_worker_count_is_configurable(self) -> None:
+        github_client = _FakeGitHubClient([(_nodes(5), None, False, 5)])
+        db_repository = _FakeRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=5,
+            max_concurrent_ranges=1,
+        )
+
+        await service.crawl()
+
+        self.assertEqual(service._per_worker_fetched, [5])
+        self.assertEqual(db_repository.total_entities, 5)
+
+    def test_split_point_is_log_scaled(self) -> None:
+        # Just over the cap: the lower half covers almost all of the log range
+        self.assertEqual(CrawlerService._split_point(1, 1_000_000, 1_001), 986_977)
+        # Far over the cap: the lower half stays near the dense low-star end
+        self.assertEqual(CrawlerService._split_point(1, 1_000_000, 5_000), 27)
+        # The split always leaves two non-empty halves
+        self.assertEqual(CrawlerService._split_point(5, 6, 1_000_000), 5)
+
+    async def test_pages_are_written_in_grouped_transactions(self) -> None:
+        """Every PAGES_PER_COMMIT pages share one write; the tail is flushed at range end."""
+        nodes = _nodes(12 * 5)
+        pages = [
+            (nodes[i * 5:(i + 1) * 5], f"cursor-{i}", i < 11, 60)
+            for i in range(12)
+        ]
+        github_client = _FakeGitHubClient(pages)
+        db_repository = _FakeRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=1000,
+        )
+
+        await service.crawl()
+
+        self.assertEqual(db_repository.total_entities, 60)
+        self.assertEqual(db_repository.batches, 2)
+        # Every batch goes through the single writer's connection
+        self.assertEqual(db_repository.connections, 1)
+
+    async def test_duplicate_ids_are_upserted_once(self) -> None:
+        """A page re-served with the same repos (e.g. after a retry) is not written twice."""
+        nodes = _nodes(5)
+        pages = [
+            (nodes + nodes[:2], "cursor-1", True, 10),
+            (nodes, "cursor-2", True, 10),
+            (_nodes(5, prefix="other"), None, False, 10),
+        ]
+        github_client = _FakeGitHubClient(pages)
+        db_repository = _FakeRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=100,
+        )
+
+        await service.crawl()
+
+        self.assertEqual(db_repository.total_entities, 10)
+        self.assertEqual(github_client.calls, 3)
+
+    async def test_failed_upsert_requeues_range(self) -> None:
+        """A failed background write re-queues the range so its rows are written later."""
+        class _FlakyRepository(_FakeRepository):
+            def __init__(self) -> None:
+                super().__init__()
+                self.failures = 0
+
+            async def bulk_upsert(self, conn, rows) -> None:
+                if self.failures == 0:
+                    self.failures += 1
+                    raise RuntimeError("connection reset")
+                await super().bulk_upsert(conn, rows)
+
+        github_client = _FakeGitHubClient([(_nodes(5), None, False, 5)] * 2)
+        db_repository = _FlakyRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=5,
+        )
+
+        await service.crawl()
+
+        self.assertEqual(db_repository.failures, 1)
+        self.assertEqual(db_repository.total_entities, 5)
+        self.assertEqual(github_client.calls, 2)
+
+    async def test_range_is_dropped_after_repeated_write_failures(self) -> None:
+        """A write that always fails re-queues its range only a bounded number of times."""
+        class _BrokenRepository(_FakeRepository):
+            async def bulk_upsert(self, conn, rows) -> None:
+                self.batches += 1
+                raise RuntimeError("constraint violation")
+
+        github_client = _FakeGitHubClient([(_nodes(5), None, False, 5)] * 10)
+        db_repository = _BrokenRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=5,
+        )
+
+        await service.crawl()
+
+        self.assertEqual(db_repository.batches, MAX_CONSECUTIVE_ERRORS)
+        self.assertEqual(github_client.calls, MAX_CONSECUTIVE_ERRORS)
+        self.assertEqual(db_repository.total_entities, 0)
+
+    async def test_writer_failure_stops_workers(self) -> None:
+        """If the writer can't reach the DB, crawl() fails instead of hanging on the full queue."""
+        class _UnreachableRepository(_FakeRepository):
+            @asynccontextmanager
+            async def connect(self):
+                raise ConnectionRefusedError("database is down")
+                yield None
+
+        pages = [(_nodes(5, prefix=f"page-{i}"), f"cursor-{i}", True, 500) for i in range(100)]
+        github_client = _FakeGitHubClient(pages)
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=_UnreachableRepository(),
+            target_count=1000,
+        )
+
+        with patch("src.application.crawler_service.PAGES_PER_COMMIT", 1):
+            with self.assertRaises(ConnectionRefusedError):
+                await asyncio.wait_for(service.crawl(), timeout=5)
+
+        self.assertEqual(asyncio.all_tasks(), {asyncio.current_task()})
+
+    async def test_successful_write_resets_the_failure_count(self) -> None:
+        """Only consecutive write failures count towards dropping a range."""
+        class _AlternatingRepository(_FakeRepository):
+            def __init__(self) -> None:
+                super().__init__()
+                self.attempts = 0
+                self.failures = 0
+
+            async def bulk_upsert(self, conn, rows) -> None:
+                self.attempts += 1
+                if self.attempts % 2:
+                    self.failures += 1
+                    raise RuntimeError("connection reset")
+                await super().bulk_upsert(conn, rows)
+
+        pages = [(_nodes(1, prefix=f"page-{i}"), f"cursor-{i}", i < 11, 12) for i in range(12)]
+        github_client = _FakeGitHubClient(pages)
+        db_repository = _AlternatingRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=1000,
+            max_concurrent_ranges=1,
+        )
+
+        with patch("src.application.crawler_service.PAGES_PER_COMMIT", 1), \
+                self.assertLogs("src.application.crawler_service", level="ERROR") as logs:
+            await service.crawl()
+
+        self.assertGreater(db_repository.failures, MAX_CONSECUTIVE_ERRORS)
+        self.assertFalse(any("Too many failed writes" in line for line in logs.output))
+
+    async def test_rate_limit_without_reset_time_requeues_range(self) -> None:
+        """An unknown reset time falls back to a fixed wait instead of killing the worker."""
+        class _LimitedClient(_FakeGitHubClient):
+            async def fetch_page(self, cursor=None, search_query="", page_size=50):
+                if self.calls == 0:
+                    self.calls += 1
+                    raise RateLimitExceededException(reset_at=None)
+                return await super().fetch_page(cursor, search_query, page_size)
+
+        github_client = _LimitedClient([None, (_nodes(5), None, False, 5)])
+        db_repository = _FakeRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=5,
+        )
+
+        with patch("src.application.crawler_service.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            await service.crawl()
+
+        mock_sleep.assert_any_call(60)
+        self.assertEqual(db_repository.total_entities, 5)
+        self.assertEqual(github_client.calls, 2)
+
+    async def test_near_limit_flushes_rows_before_waiting_for_reset(self) -> None:
+        """Buffered rows are written before a worker waits out the rate-limit window."""
+        reset_at = (datetime.now(timezone.utc) + timedelta(minutes=30)).isoformat()
+
+        class _NearLimitClient(_FakeGitHubClient):
+            async def fetch_page(self, cursor=None, search_query="", page_size=50):
+                page = await super().fetch_page(cursor, search_query, page_size)
+                if self.calls == 1:
+                    return replace(page, rate_remaining=3, rate_reset_at=reset_at)
+                return page
+
+        github_client = _NearLimitClient([
+            (_nodes(5), "cursor-1", True, 10),
+            (_nodes(5, prefix="other"), None, False, 10),
+        ])
+        db_repository = _FakeRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=100,
+        )
+
+        written_before_wait = []
+
+        async def _sleep(seconds):
+            written_before_wait.append(db_repository.total_entities)
+
+        with patch("src.application.crawler_service.asyncio.sleep", side_effect=_sleep) as mock_sleep:
             await service.crawl()
 
-        # First call is the full range, then two sub-ranges after the split
-        self.assertEqual(client.queries[0], "stars:10..1000000")
-        self.assertEqual(client.queries[1], "stars:10..500005")
-        self.assertEqual(client.queries[2], "stars:500006..1000000")
+        (wait_seconds,), _ = mock_sleep.call_args
+        self.assertGreater(wait_seconds, 1700)
+        self.assertEqual(written_before_wait, [5])
+        # The range resumes from its cursor rather than starting over
+        self.assertEqual(github_client.calls, 2)
         self.assertEqual(db_repository.total_entities, 10)
 
+    async def test_open_circuit_requeues_range(self) -> None:
+        """A range interrupted by an open circuit is retried after the cooldown."""
+        class _TrippingClient(_FakeGitHubClient):
+            async def fetch_page(self, cursor=None, search_query="", page_size=50):
+                if self.calls == 0:
+                    self.calls += 1
+                    raise CircuitOpenException(retry_after=0)
+                return await super().fetch_page(cursor, search_query, page_size)
+
+        github_client = _TrippingClient([None, (_nodes(5), None, False, 5)])
+        db_repository = _FakeRepository()
+
+        service = CrawlerService(
+            github_client=github_client,
+            db_repository=db_repository,
+            target_count=5,
+        )
+
+        await service.crawl()
+
+        self.assertEqual(db_repository.total_entities, 5)
+        self.assertEqual(github_client.calls, 2)
+
     async def test_initial_star_range_starts_at_ten(self) -> None:
         """The crawler starts at 10 stars to ensure enough repos for 100K target."""
         self.assertEqual(INITIAL_MIN_STARS, 10)
+
+
+class TestRateBudget(unittest.TestCase):
+    def test_update_without_rate_info_keeps_last_budget(self) -> None:
+        budget = RateBudget()
+        reset_at = datetime.now(timezone.utc) + timedelta(minutes=10)
+        budget.update(4000, reset_at.isoformat())
+        budget.update(None, None)
+
+        self.assertEqual(budget.remaining, 4000)
+
+    def test_no_delay_when_budget_is_ample(self) -> None:
+        budget = RateBudget()
+        reset_at = datetime.now(timezone.utc) + timedelta(minutes=10)
+        budget.update(4000, reset_at.isoformat())
+
+        self.assertEqual(budget.delay(3), 0.0)
+
+    def test_delay_spreads_scarce_budget_until_reset(self) -> None:
+        budget = RateBudget()
+        reset_at = datetime.now(timezone.utc) + timedelta(seconds=600)
+        budget.update(100, reset_at.isoformat())
+
+        # 600s / 100 points * 3 workers ≈ 18s between requests per worker
+        self.assertAlmostEqual(budget.delay(3), 18.0, delta=0.5)
+
+    def test_delay_never_exceeds_time_to_reset(self) -> None:
+        budget = RateBudget()
+        reset_at = datetime.now(timezone.utc) + timedelta(seconds=600)
+        budget.update(5, reset_at.isoformat())
+
+        # 600s / 5 points * 20 workers would be 2400s, well past the reset
+        self.assertLessEqual(budget.delay(20), 600.0)
+        self.assertAlmostEqual(budget.delay(20), 600.0, delta=0.5)
@@ -1,7 +1,61 @@
+import asyncio
 import unittest
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from src.infrastructure.github_client import GitHubGraphQLClient
+import aiohttp
+import orjson
+
+from src.domain.exceptions import CircuitOpenException, RateLimitExceededException
+from src.infrastructure.github_client import (
+    BASE_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    DEFAULT_PAGE_SIZE,
+    GRAPHQL_QUERY,
+    MAX_RETRIES,
+    MIN_PAGE_SIZE,
+    PAGE_SIZE_GROWTH_STREAK,
+    GitHubGraphQLClient,
+)
+
+
+_RATE_LIMIT = {"remaining": 4999, "resetAt": "2026-01-01T00:00:00Z"}
+
+
+def _search_body(nodes=(), repository_count=0, page_info=None, rate_limit=_RATE_LIMIT):
+    return {
+        "data": {
+            "search": {
+                "repositoryCount": repository_count,
+                "pageInfo": page_info or {},
+                "nodes": list(nodes),
+            },
+            "rateLimit": rate_limit,
+        }
+    }
+
+
+def _response(status=200, body=None, headers=None):
+    resp = AsyncMock()
+    resp.status = status
+    resp.headers = headers or {}
+    resp.read = AsyncMock(return_value=orjson.dumps(body))
+    resp.__aenter__ = AsyncMock(return_value=resp)
+    resp.__aexit__ = AsyncMock(return_value=False)
+    return resp
+
+
+def _client_with_responses(*responses, **client_kwargs):
+    """A client whose session replays ``responses`` in order, or repeats a single one."""
+    client = GitHubGraphQLClient(token="test-token", **client_kwargs)
+    session = AsyncMock()
+    session.closed = False
+    if len(responses) == 1:
+        session.post = MagicMock(return_value=responses[0])
+    else:
+        session.post = MagicMock(side_effect=list(responses))
+    client._session = session
+    return client
 
 
 class TestGitHubGraphQLClient(unittest.TestCase):
@@ -17,43 +71,316 @@ class TestGitHubGraphQLClient(unittest.TestCase):
         self.assertIn("User-Agent", client.headers)
         self.assertIn("Accept", client.headers)
 
+    def test_headers_request_compressed_responses(self) -> None:
+        client = GitHubGraphQLClient(token="t")
+        self.assertEqual(client.headers["Accept-Encoding"], "gzip, br")
+
 
 class TestSecondaryRateLimit(unittest.IsolatedAsyncioTestCase):
     async def test_403_retry_after_is_respected(self) -> None:
         """When GitHub returns 403 + Retry-After, the client sleeps and retries."""
+        client = _client_with_responses(
+            # First response: 403 with Retry-After header
+            _response(403, headers={"Retry-After": "1"}),
+            # Second response: 200 with valid data
+            _response(body=_search_body(
+                nodes=[{"id": "1"}],
+                repository_count=5,
+                page_info={"endCursor": "abc", "hasNextPage": False},
+            )),
+        )
+
+        with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            page = await client.fetch_page()
+
+        # Should have slept for the Retry-After value (1 second)
+        mock_sleep.assert_any_call(1)
+        self.assertEqual(page.nodes, [{"id": "1"}])
+        self.assertEqual(page.end_cursor, "abc")
+        self.assertFalse(page.has_next)
+        self.assertEqual(page.repo_count, 5)
+        self.assertEqual(page.rate_remaining, 4999)
+        self.assertEqual(page.rate_reset_at, "2026-01-01T00:00:00Z")
+
+
+    async def test_429_is_treated_as_secondary_rate_limit(self) -> None:
+        client = _client_with_responses(
+            _response(429, headers={"Retry-After": "2"}),
+            _response(body=_search_body()),
+        )
+
+        with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            await client.fetch_page()
+
+        mock_sleep.assert_any_call(2)
+        self.assertEqual(client._session.post.call_count, 2)
+
+
+class TestBackoff(unittest.IsolatedAsyncioTestCase):
+    async def test_server_error_uses_full_jitter(self) -> None:
+        client = _client_with_responses(_response(502), _response(body=_search_body()))
+
+        with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock), \
+                patch("src.infrastructure.github_client.random.uniform", return_value=0.5) as uniform:
+            await client.fetch_page()
+
+        uniform.assert_called_once_with(0, BASE_DELAY)
+
+
+    async def test_malformed_ok_responses_are_retried(self) -> None:
+        not_json = _response()
+        not_json.read = AsyncMock(return_value=b"<html>502 Bad Gateway</html>")
+        client = _client_with_responses(
+            not_json,
+            _response(body={}),
+            _response(body=_search_body(nodes=[{"id": "1"}], repository_count=1)),
+        )
+
+        with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock):
+            page = await client.fetch_page()
+
+        self.assertEqual(page.nodes, [{"id": "1"}])
+        self.assertEqual(client._session.post.call_count, 3)
+        self.assertLess(client._page_size, DEFAULT_PAGE_SIZE)
+
+
+class TestAdaptivePageSize(unittest.TestCase):
+    def test_page_size_halves_on_error_and_regrows_after_streak(self) -> None:
         client = GitHubGraphQLClient(token="test-token")
 
-        # First response: 403 with Retry-After header
-        resp_403 = AsyncMock()
-        resp_403.status = 403
-        resp_403.headers = {"Retry-After": "1"}
-        resp_403.__aenter__ = AsyncMock(return_value=resp_403)
-        resp_403.__aexit__ = AsyncMock(return_value=False)
-
-        # Second response: 200 with valid data
-        resp_200 = AsyncMock()
-        resp_200.status = 200
-        resp_200.raise_for_status = MagicMock()
-        resp_200.json = AsyncMock(return_value={
-            "data": {
-                "search": {
-                    "repositoryCount": 5,
-                    "pageInfo": {"endCursor": "abc", "hasNextPage": False},
-                    "nodes": [{"id": "1"}],
-                },
-                "rateLimit": {"remaining": 4999, "resetAt": "2026-01-01T00:00:00Z"},
-            }
-        })
-        resp_200.__aenter__ = AsyncMock(return_value=resp_200)
-        resp_200.__aexit__ = AsyncMock(return_value=False)
+        self.assertEqual(client._decrease_page_size(DEFAULT_PAGE_SIZE), DEFAULT_PAGE_SIZE // 2)
+        self.assertEqual(client._decrease_page_size(MIN_PAGE_SIZE), MIN_PAGE_SIZE)
 
-        session = AsyncMock()
-        session.post = MagicMock(side_effect=[resp_403, resp_200])
+        for _ in range(PAGE_SIZE_GROWTH_STREAK):
+            client._record_success()
+        self.assertEqual(client._page_size, MIN_PAGE_SIZE + 1)
+
+    def test_page_size_never_grows_past_default(self) -> None:
+        client = GitHubGraphQLClient(token="test-token")
+
+        for _ in range(PAGE_SIZE_GROWTH_STREAK * 3):
+            client._record_success()
+        self.assertEqual(client._page_size, DEFAULT_PAGE_SIZE)
+
+
+class TestCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+    async def test_repeated_server_errors_open_the_circuit(self) -> None:
+        client = _client_with_responses(_response(502))
+
+        with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock):
+            with self.assertRaises(CircuitOpenException):
+                await client.fetch_page()
+            # While open, further calls fail without touching the network
+            with self.assertRaises(CircuitOpenException):
+                await client.fetch_page()
+
+        self.assertEqual(client._session.post.call_count, CIRCUIT_FAILURE_THRESHOLD)
+
+    async def test_client_errors_do_not_open_the_circuit(self) -> None:
+        client = _client_with_responses(_response(401, body={"message": "Bad credentials"}))
+
+        with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock):
+            with self.assertRaises(Exception) as ctx:
+                await client.fetch_page()
+
+        self.assertNotIsInstance(ctx.exception, CircuitOpenException)
+        self.assertEqual(client._session.post.call_count, MAX_RETRIES)
+        self.assertEqual(client._consecutive_failures, 0)
+
+    async def test_half_open_circuit_lets_one_probe_through(self) -> None:
+        client = GitHubGraphQLClient(token="test-token")
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+            client._record_failure()
+        # The cooldown has passed
+        client._breaker_open_until = 0.0
+
+        release = asyncio.Event()
+        posts = []
+
+        async def _post(body):
+            posts.append(body)
+            await release.wait()
+            return 200, {}, orjson.dumps(_search_body())
+
+        client._post = _post
+        probe = asyncio.create_task(client.fetch_page())
+        await asyncio.sleep(0)
+
+        # Everyone else fails fast while the probe is in flight
+        with self.assertRaises(CircuitOpenException):
+            await asyncio.wait_for(client.fetch_page(), timeout=1)
+        self.assertEqual(len(posts), 1)
+
+        release.set()
+        await probe
+
+        # The probe succeeded, so the circuit is closed again
+        await client.fetch_page()
+        self.assertEqual(len(posts), 2)
+
+    def test_success_closes_the_circuit(self) -> None:
+        client = GitHubGraphQLClient(token="test-token")
+        for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+            client._record_failure()
+
+        client._record_success()
+        client._record_failure()
+
+        client._check_circuit()
+        self.assertEqual(client._consecutive_failures, 1)
+
+
+class TestPrimaryRateLimit(unittest.IsolatedAsyncioTestCase):
+    @staticmethod
+    def _client_returning(rate_limit):
+        return _client_with_responses(
+            _response(body=_search_body(nodes=[{"id": "1"}], repository_count=1, rate_limit=rate_limit))
+        )
+
+    async def test_near_limit_returns_page_without_sleeping(self) -> None:
+        """Waiting out the window is left to the crawler, which flushes its rows first."""
+        reset_at = (datetime.now(timezone.utc) + timedelta(seconds=120)).isoformat()
+        client = self._client_returning({"remaining": 3, "resetAt": reset_at})
 
         with patch("src.infrastructure.github_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
-            nodes, cursor, has_next, count = await client.fetch_page(session)
+            page = await client.fetch_page()
 
-        # Should have slept for the Retry-After value (1 second)
-        mock_sleep.assert_any_call(1)
-        self.assertEqual(nodes, [{"id": "1"}])
-        self.assertEqual(count, 5)
+        mock_sleep.assert_not_called()
+        self.assertEqual(page.nodes, [{"id": "1"}])
+        self.assertEqual(page.rate_remaining, 3)
+        self.assertEqual(page.rate_reset_at, reset_at)
+
+    async def test_exhausted_limit_behind_server_error_raises_with_reset(self) -> None:
+        client = _client_with_responses(
+            _response(502, headers={"x-ratelimit-remaining": "0", "x-ratelimit-reset": "1767225600"})
+        )
+
+        with self.assertRaises(RateLimitExceededException) as ctx:
+            await client.fetch_page()
+
+        self.assertEqual(ctx.exception.reset_at, "2026-01-01T00:00:00+00:00")
+
+
+class _DictCache:
+    """In-memory stand-in for the subset of redis.asyncio.Redis the client uses."""
+
+    def __init__(self) -> None:
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    async def test_repeated_page_is_served_from_cache(self) -> None:
+        cache = _DictCache()
+        client = _client_with_responses(
+            _response(body=_search_body(
+                nodes=[{"id": "1"}],
+                repository_count=1,
+                page_info={"endCursor": "abc", "hasNextPage": True},
+            )),
+            cache=cache,
+        )
+
+        first = await client.fetch_page(search_query="stars:1..10")
+        second = await client.fetch_page(search_query="stars:1..10")
+
+        self.assertEqual(client._session.post.call_count, 1)
+        self.assertEqual(first.nodes, second.nodes)
+        self.assertEqual(first.end_cursor, second.end_cursor)
+        self.assertIsNone(second.rate_remaining)
+        self.assertIsNone(second.rate_reset_at)
+        self.assertEqual(len(cache.store), 1)
+
+
+class TestRequestPayload(unittest.IsolatedAsyncioTestCase):
+    async def test_payload_bytes_decode_to_query_and_variables(self) -> None:
+        client = _client_with_responses(_response(body=_search_body()))
+
+        await client.fetch_page(cursor="abc", search_query="stars:1..10", page_size=7)
+
+        kwargs = client._session.post.call_args.kwargs
+        payload = orjson.loads(kwargs["data"])
+        self.assertEqual(payload["query"], GRAPHQL_QUERY)
+        self.assertEqual(
+            payload["variables"],
+            {"cursor": "abc", "searchQuery": "stars:1..10", "pageSize": 7},
+        )
+        self.assertEqual(kwargs["headers"]["Content-Type"], "application/json")
+
+
+class TestValidateToken(unittest.IsolatedAsyncioTestCase):
+    async def test_errors_in_body_raise(self) -> None:
+        client = _client_with_responses(_response(body={"errors": [{"message": "Bad credentials"}]}))
+
+        with self.assertRaises(RuntimeError):
+            await client.validate_token()
+
+        self.assertIn("viewer", orjson.loads(client._session.post.call_args.kwargs["data"])["query"])
+
+
+class TestSessionLifecycle(unittest.IsolatedAsyncioTestCase):
+    async def test_session_is_created_once_and_closed_on_exit(self) -> None:
+        with patch.object(GitHubGraphQLClient, "_preconnect", new_callable=AsyncMock):
+            async with GitHubGraphQLClient(token="test-token") as client:
+                first = await client._get_session()
+                second = await client._get_session()
+                self.assertIs(first, second)
+                self.assertEqual(first.headers["Authorization"], "Bearer test-token")
+
+        self.assertTrue(first.closed)
+        self.assertIsNone(client._session)
+
+    async def test_enter_warms_the_connection_pool(self) -> None:
+        client = GitHubGraphQLClient(token="test-token")
+
+        head = AsyncMock()
+        head.__aenter__ = AsyncMock(return_value=head)
+        head.__aexit__ = AsyncMock(return_value=False)
+        session = AsyncMock()
+        session.closed = False
+        session.head = MagicMock(return_value=head)
+        client._session = session
+
+        async with client:
+            session.head.assert_called_once()
+
+    async def test_failed_preconnect_is_ignored(self) -> None:
+        client = GitHubGraphQLClient(token="test-token")
+
+        session = AsyncMock()
+        session.closed = False
+        session.head = MagicMock(side_effect=aiohttp.ClientConnectionError("no route"))
+        client._session = session
+
+        async with client:
+            pass
+
+
+class TestHttp2Transport(unittest.IsolatedAsyncioTestCase):
+    def test_http2_requires_httpx(self) -> None:
+        with patch("src.infrastructure.github_client.httpx", None):
+            with self.assertRaises(RuntimeError):
+                GitHubGraphQLClient(token="test-token", http2=True)
+
+    async def test_http2_transport_posts_payload_bytes(self) -> None:
+        with patch("src.infrastructure.github_client.httpx", MagicMock()):
+            client = GitHubGraphQLClient(token="test-token", http2=True)
+
+        response = MagicMock(status_code=200, headers={}, content=orjson.dumps(
+            _search_body(nodes=[{"id": "1"}], repository_count=1)
+        ))
+        http2_client = MagicMock(post=AsyncMock(return_value=response), aclose=AsyncMock())
+        client._http2_client = http2_client
+
+        page = await client.fetch_page(search_query="stars:1..10")
+        await client.aclose()
+
+        self.assertEqual(page.nodes, [{"id": "1"}])
+        payload = orjson.loads(http2_client.post.call_args.kwargs["content"])
+        self.assertEqual(payload["variables"]["searchQuery"], "stars:1..10")
+        http2_client.aclose.assert_awaited_once()
@@ -0,0 +1,30 @@
+import unittest
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+
+from src.domain.models import RepositoryEntity
+
+
+def _fields(**overrides):
+    fields = {
+        "id": "repo-1",
+        "name": "example",
+        "owner": "octocat",
+        "stars": 1,
+        "updated_at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    }
+    fields.update(overrides)
+    return fields
+
+
+class TestRepositoryEntity(unittest.TestCase):
+    def test_unknown_fields_are_rejected(self) -> None:
+        with self.assertRaises(ValidationError):
+            RepositoryEntity(**_fields(stargazers=1))
+
+    def test_entity_is_immutable(self) -> None:
+        entity = RepositoryEntity(**_fields())
+
+        with self.assertRaises(ValidationError):
+            entity.stars = 2